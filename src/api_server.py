@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import asyncio
+import secrets
+import sqlite3
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# Core project imports
+from nlp_engine import NLPEngine, is_execution_error
+from database.audit_schema import create_audit_table
+from services.audit_logger import log_action
+from services.example_store import ExampleStore
+from rbac_manager import is_authorized, get_user_role
+from safety_layer import validate_query
+
+DATA_DIR = "data"
+PENDING_TTL_SECONDS = 300
+STREAM_BATCH_SIZE = 500
+
+
+# -------------------- REQUEST MODELS --------------------
+class ClarifyRequest(BaseModel):
+    dataset: str
+    question: str
+
+
+class SQLRequest(BaseModel):
+    emp_id: str
+    dataset: str
+    question: str
+
+
+class QueryRequest(BaseModel):
+    emp_id: str
+    dataset: str
+    question: str
+    stream: str | None = None  # None, "json" or "ndjson"
+
+
+class ExecuteRequest(BaseModel):
+    emp_id: str
+    token: str
+    approve: bool = True
+
+
+def create_app(llm=None, max_workers=4, example_store=None):
+    """
+    Builds the async HTTP API around the same pipeline as app.py.
+    Pass `llm` (any LangChain chat model, e.g. FakeListChatModel) to run without Ollama.
+    """
+    db_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlite")
+    example_store = example_store or ExampleStore()
+    engines = {}
+    pending = {}
+
+    async def in_pool(func, *args):
+        """Runs blocking SQLite / RBAC work off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(db_pool, func, *args)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await in_pool(create_audit_table)
+        yield
+        db_pool.shutdown(wait=False)
+
+    app = FastAPI(title="LegalBrain AI API", lifespan=lifespan)
+
+    def resolve_dataset(dataset):
+        path = os.path.join(DATA_DIR, dataset)
+        if os.path.basename(dataset) != dataset or not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+        return path
+
+    def get_engine(dataset):
+        """Initializes the engine only once per database (mirrors load_engine in app.py)."""
+        path = resolve_dataset(dataset)
+        if path not in engines:
+            engines[path] = NLPEngine(path, llm=llm, example_store=example_store, executor=db_pool)
+        return engines[path]
+
+    async def build_sql(engine, emp_id, question):
+        """Generates SQL and runs it through RBAC and the safety layer."""
+        sql = await engine.agenerate_sql(question)
+        if sql.startswith("NLP Error"):
+            raise HTTPException(status_code=502, detail=sql)
+
+        if not await in_pool(is_authorized, emp_id, sql):
+            raise HTTPException(status_code=403, detail="RBAC BLOCKED: role does not have permission for this operation.")
+
+        verdict = validate_query(sql)
+        if not verdict["allowed"]:
+            raise HTTPException(status_code=400, detail={"sql": sql, **verdict})
+        return sql, verdict
+
+    def select_guard(emp_id):
+        """Approves a repaired statement only if it is still an authorized read-only query."""
+        async def guard(sql):
+            return validate_query(sql)["risk_level"] == "low" and await in_pool(is_authorized, emp_id, sql)
+        return guard
+
+    def expire_pending():
+        now = time.time()
+        for token in [t for t, p in pending.items() if p["expires_at"] < now]:
+            del pending[token]
+
+    def connect_and_execute(db_path, sql):
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            return conn, conn.execute(sql.rstrip().rstrip(";"))
+        except sqlite3.Error:
+            conn.close()
+            raise
+
+    async def open_cursor(db_path, sql):
+        """
+        Connects and executes a SELECT on a pool thread so SQLite errors surface before streaming starts.
+        Returns (conn, cursor), or an "Execution Error" string like NLPEngine.execute_query.
+        """
+        try:
+            return await in_pool(connect_and_execute, db_path, sql)
+        except sqlite3.Error as e:
+            return f"Execution Error: {str(e)}"
+
+    async def stream_rows(conn, cursor, sql, fmt, audit):
+        """
+        Yields a SELECT result in batches without materializing it in a DataFrame.
+        The audit entry is written once streaming ends, with the real row count and outcome.
+        """
+        columns = [c[0] for c in cursor.description or []]
+        row_count = 0
+        outcome = "ERROR"
+        try:
+            if fmt == "ndjson":
+                yield json.dumps({"type": "columns", "sql": sql, "columns": columns}) + "\n"
+            else:
+                yield '{"sql": ' + json.dumps(sql) + ', "columns": ' + json.dumps(columns) + ', "rows": ['
+
+            while True:
+                batch = await in_pool(cursor.fetchmany, STREAM_BATCH_SIZE)
+                if not batch:
+                    break
+                for row in batch:
+                    record = json.dumps(dict(zip(columns, row)), default=str)
+                    if fmt == "ndjson":
+                        yield '{"type": "row", "data": ' + record + "}\n"
+                    else:
+                        yield ("," if row_count else "") + record
+                    row_count += 1
+
+            if fmt == "ndjson":
+                yield json.dumps({"type": "end", "row_count": row_count}) + "\n"
+            else:
+                yield '], "row_count": ' + str(row_count) + "}"
+            outcome = "SUCCESS"
+        finally:
+            await in_pool(conn.close)
+            await in_pool(log_action, *audit, sql, outcome, row_count)
+
+    def to_payload(sql, result):
+        if isinstance(result, pd.DataFrame):
+            rows = json.loads(result.to_json(orient="records", date_format="iso"))
+            return {"status": "success", "sql": sql, "columns": list(result.columns), "rows": rows, "row_count": len(rows)}
+        return {"status": "success", "sql": sql, "message": result, "rows": [], "row_count": 0}
+
+    @app.get("/datasets")
+    async def datasets():
+        if not os.path.isdir(DATA_DIR):
+            return {"datasets": []}
+        return {"datasets": [f for f in os.listdir(DATA_DIR) if f.endswith(('.sqlite', '.db', '.sqlite3'))]}
+
+    @app.get("/metrics")
+    async def metrics():
+        return {os.path.basename(path): engine.metrics_summary() for path, engine in engines.items()}
+
+    @app.post("/clarify")
+    async def clarify(req: ClarifyRequest):
+        engine = get_engine(req.dataset)
+        clarification = await engine.aget_clarification(req.question)
+        status = "ambiguous" if "AMBIGUOUS" in clarification else "clear"
+        return {"status": status, "message": clarification}
+
+    @app.post("/sql")
+    async def sql(req: SQLRequest):
+        engine = get_engine(req.dataset)
+        generated_sql, verdict = await build_sql(engine, req.emp_id, req.question)
+        return {"sql": generated_sql, **verdict}
+
+    @app.post("/query")
+    async def query(req: QueryRequest):
+        if req.stream not in (None, "json", "ndjson"):
+            raise HTTPException(status_code=400, detail="stream must be 'json' or 'ndjson'")
+
+        engine = get_engine(req.dataset)
+        dataset_name = os.path.basename(engine.db_path)
+        engine.begin_question()
+
+        clarification = await engine.aget_clarification(req.question)
+        if "AMBIGUOUS" in clarification:
+            return {"status": "ambiguous", "message": clarification}
+
+        generated_sql, verdict = await build_sql(engine, req.emp_id, req.question)
+        role = await in_pool(get_user_role, req.emp_id)
+
+        # Phase one of the DML flow: hand back a token instead of executing
+        if verdict["risk_level"] != "low":
+            expire_pending()
+            token = secrets.token_urlsafe(16)
+            pending[token] = {
+                "emp_id": req.emp_id,
+                "role": role,
+                "db_path": engine.db_path,
+                "question": req.question,
+                "sql": generated_sql,
+                "expires_at": time.time() + PENDING_TTL_SECONDS,
+            }
+            return {"status": "confirmation_required", "sql": generated_sql, "token": token,
+                    "expires_in": PENDING_TTL_SECONDS, "reason": verdict["reason"]}
+
+        if req.stream:
+            generated_sql, result = await engine.aexecute_with_repair(
+                generated_sql, req.question, guard=select_guard(req.emp_id),
+                execute=lambda sql: open_cursor(engine.db_path, sql))
+            if is_execution_error(result):
+                await in_pool(log_action, req.emp_id, role, "SELECT", dataset_name, req.question, generated_sql, "ERROR", 0)
+                raise HTTPException(status_code=400, detail={"sql": generated_sql, "error": result})
+            conn, cursor = result
+            audit = (req.emp_id, role, "SELECT", dataset_name, req.question)
+            media_type = "application/x-ndjson" if req.stream == "ndjson" else "application/json"
+            return StreamingResponse(stream_rows(conn, cursor, generated_sql, req.stream, audit), media_type=media_type)
+
+        generated_sql, result = await engine.aexecute_with_repair(generated_sql, req.question, guard=select_guard(req.emp_id))
+        if is_execution_error(result):
+            await in_pool(log_action, req.emp_id, role, "SELECT", dataset_name, req.question, generated_sql, "ERROR", 0)
+            raise HTTPException(status_code=400, detail={"sql": generated_sql, "error": result})
+
+        payload = await in_pool(to_payload, generated_sql, result)
+        await in_pool(log_action, req.emp_id, role, "SELECT", dataset_name, req.question, generated_sql, "SUCCESS", payload["row_count"])
+        return payload
+
+    @app.post("/execute")
+    async def execute(req: ExecuteRequest):
+        # Phase two of the DML flow: redeem the token to commit or reject
+        expire_pending()
+        job = pending.get(req.token)
+        if not job or job["emp_id"] != req.emp_id:
+            raise HTTPException(status_code=404, detail="Unknown or expired confirmation token.")
+        del pending[req.token]
+
+        if not req.approve:
+            return {"status": "rejected", "sql": job["sql"]}
+
+        if not await in_pool(is_authorized, req.emp_id, job["sql"]):
+            raise HTTPException(status_code=403, detail="RBAC BLOCKED: role does not have permission for this operation.")
+
+        engine = engines[job["db_path"]]
+        result = await in_pool(engine.execute_query, job["sql"])
+        dataset_name = os.path.basename(job["db_path"])
+        if is_execution_error(result):
+            await in_pool(log_action, req.emp_id, job["role"], "DML_COMMIT", dataset_name, job["question"], job["sql"], "ERROR", 0)
+            raise HTTPException(status_code=400, detail={"sql": job["sql"], "error": result})
+
+        await in_pool(log_action, req.emp_id, job["role"], "DML_COMMIT", dataset_name, job["question"], job["sql"], "SUCCESS", 0)
+        return {"status": "committed", "sql": job["sql"], "message": result}
+
+    return app
+
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.getenv("API_HOST", "127.0.0.1"), port=int(os.getenv("API_PORT", "8000")))
@@ -6,20 +6,27 @@ import io
 import time
 
 # Core project imports
-from nlp_engine import NLPEngine  
+from nlp_engine import NLPEngine, is_execution_error
 from database.audit_schema import create_audit_table
 from services.audit_logger import log_action
 from database.db_config import DB_PATH
 from rbac_manager import is_authorized
+from safety_layer import validate_query
+from services.example_store import ExampleStore
 
 # Initialize Audit Database on startup
 create_audit_table()
 
 # -------------------- OPTIMIZATION: ENGINE CACHING --------------------
+@st.cache_resource
+def load_example_store():
+    """One few-shot store shared by every engine; it re-indexes when the audit log grows."""
+    return ExampleStore()
+
 @st.cache_resource
 def load_engine(db_path):
     """Initializes the engine only once per database to save resources."""
-    return NLPEngine(db_path)
+    return NLPEngine(db_path, example_store=load_example_store())
 
 # -------------------- PAGE CONFIG --------------------
 st.set_page_config(page_title="LegalBrain AI", page_icon="⚖️", layout="wide")
@@ -148,6 +155,7 @@ if st.session_state.logged_in:
                 try:
                     update_ui_steps(0)
                     engine = load_engine(st.session_state.db_path)
+                    engine.begin_question()
                     
                     update_ui_steps(1)
                     clarification = engine.get_clarification(user_input)
@@ -183,10 +191,14 @@ if st.session_state.logged_in:
                                 status.update(label="✅ Authorization Required", state="complete", expanded=False)
                             else:
                                 update_ui_steps(5)
-                                result = engine.execute_query(generated_sql, user_command=user_input)
+                                # Bounded self-repair: a repaired query must still be an authorized SELECT
+                                emp_id = st.session_state.user['emp_id']
+                                guard = lambda sql: validate_query(sql)["risk_level"] == "low" and is_authorized(emp_id, sql)
+                                generated_sql, result = engine.execute_with_repair(generated_sql, user_input, guard=guard, user_command=user_input)
+                                outcome = "ERROR" if is_execution_error(result) else "SUCCESS"
                                 
                                 # Log Audit for SELECT
-                                log_action(st.session_state.user["name"], st.session_state.user["role"], "SELECT", os.path.basename(st.session_state.db_path), user_input, generated_sql, "SUCCESS", len(result) if isinstance(result, pd.DataFrame) else 0)
+                                log_action(st.session_state.user["name"], st.session_state.user["role"], "SELECT", os.path.basename(st.session_state.db_path), user_input, generated_sql, outcome, len(result) if isinstance(result, pd.DataFrame) else 0)
                                 
                                 st.session_state.last_result = {"type": "data", "sql": generated_sql, "data": result}
                                 update_ui_steps(6)
@@ -206,7 +218,8 @@ if st.session_state.logged_in:
                 if st.button("✅ Authorize & Commit", use_container_width=True):
                     engine = load_engine(st.session_state.db_path)
                     res = engine.execute_query(st.session_state.pending_dml, user_command=st.session_state.last_query)
-                    log_action(st.session_state.user["name"], st.session_state.user["role"], "DML_COMMIT", os.path.basename(st.session_state.db_path), st.session_state.last_query, st.session_state.pending_dml, "SUCCESS", 0)
+                    outcome = "ERROR" if is_execution_error(res) else "SUCCESS"
+                    log_action(st.session_state.user["name"], st.session_state.user["role"], "DML_COMMIT", os.path.basename(st.session_state.db_path), st.session_state.last_query, st.session_state.pending_dml, outcome, 0)
                     st.session_state.last_result = {"type": "data", "sql": st.session_state.pending_dml, "data": res}
                     st.session_state.pending_dml = None
                     st.rerun()
@@ -239,6 +252,8 @@ if st.session_state.logged_in:
     # --- AUDIT TABS ---
     if len(tabs) > 1:
         with tabs[1]:
+            metrics = load_engine(st.session_state.db_path).metrics_summary()
+            st.caption(f"First-attempt success: {metrics['first_attempt_success_rate']:.0%} · Mean LLM calls per answered question: {metrics['mean_llm_calls_per_answer']:.2f}")
             try:
                 with sqlite3.connect(DB_PATH) as conn:
                     df_logs = pd.read_sql_query("SELECT * FROM audit_log ORDER BY executed_at DESC", conn)
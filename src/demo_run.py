@@ -1,10 +1,12 @@
 import pandas as pd
 from nlp_engine import NLPEngine
 from rbac_manager import is_authorized  # <-- import your RBAC
+from safety_layer import validate_query
+from services.example_store import ExampleStore
 
 def run_complete_demo():
     db_path = "../data/college_2.sqlite"
-    engine = NLPEngine(db_path)
+    engine = NLPEngine(db_path, example_store=ExampleStore())
 
     print("=== LegalBrain AI: End-to-End Demo ===")
     print(f"Connected to: {db_path}")
@@ -18,6 +20,8 @@ def run_complete_demo():
         if user_input.lower() == 'exit':
             break
 
+        engine.begin_question()
+
         # --- Step 1: Clarification ---
         print("\n--- Step 1: Checking Intent Clarity ---")
         status = engine.get_clarification(user_input)
@@ -51,7 +55,8 @@ def run_complete_demo():
 
         # --- Step 5: Execute ---
         print("\n--- Step 3: Database Execution ---")
-        result = engine.execute_query(generated_sql)
+        guard = lambda sql: validate_query(sql)["risk_level"] == "low" and is_authorized(emp_id, sql)
+        generated_sql, result = engine.execute_with_repair(generated_sql, user_input, guard=guard)
 
         # --- Step 6: Display ---
         if isinstance(result, pd.DataFrame):
@@ -1,4 +1,6 @@
 import os
+import asyncio
+import contextvars
 import sqlite3
 import re
 import pandas as pd
@@ -9,14 +11,114 @@ from langchain_core.prompts import ChatPromptTemplate
 # Load environment variables
 load_dotenv()
 
+CLARIFICATION_TEMPLATE = """<|im_start|>system
+You are a SQL Architect. Analyze the user query against the SCHEMA.
+1. If 'high', 'best', 'top', or 'values' is used and multiple numeric columns exist, respond AMBIGUOUS.
+2. If the query clearly maps to a column or is a CREATE/INSERT action, respond CLEAR.
+3. If 'values' is used without a column name, it is ALWAYS AMBIGUOUS.
+
+SCHEMA:
+{schema}
+<|im_end|>
+<|im_start|>user
+{question}
+<|im_end|>
+<|im_start|>assistant
+"""
+
+SQL_TEMPLATE = """<|im_start|>system
+You are an expert SQLite Translator. Logic rules:
+1. INTENT: "Show/List/Who" -> SELECT. "Total/Sum" -> SUM(). "How many" -> COUNT().
+2. SORTING: If "top/best/high", use ORDER BY [col] DESC LIMIT [N].
+3. SQLITE RULES: NEVER use 'CREATE DATABASE' or 'USE'. Use 'CREATE TABLE IF NOT EXISTS'.
+4. Output ONLY the SQL code. No markdown. No explanation.
+
+SCHEMA:
+{schema}
+
+{examples}
+<|im_end|>
+<|im_start|>user
+{question}
+<|im_end|>
+<|im_start|>assistant
+"""
+
+REPAIR_TEMPLATE = """<|im_start|>system
+You are an expert SQLite Translator. The SQL below failed on this database.
+Fix it using the SCHEMA and the ERROR. Keep the same intent.
+Output ONLY the corrected SQL code. No markdown. No explanation.
+
+SCHEMA:
+{schema}
+<|im_end|>
+<|im_start|>user
+QUESTION: {question}
+FAILED SQL: {sql}
+ERROR: {error}
+<|im_end|>
+<|im_start|>assistant
+"""
+
+MAX_REPAIRS = 1
+
+# LLM calls made for the question currently being handled (see NLPEngine.begin_question)
+_question_llm_calls = contextvars.ContextVar("question_llm_calls", default=None)
+
+
+def is_execution_error(result):
+    return isinstance(result, str) and result.startswith("Execution Error")
+
+
+def clean_sql(text):
+    return re.sub(r'```sql|```', '', text.strip()).strip()
+
+
 class NLPEngine:
-    def __init__(self, db_path):
+    def __init__(self, db_path, llm=None, example_store=None, max_repairs=MAX_REPAIRS, executor=None):
+        """
+        `llm` can be any LangChain chat model (e.g. a fake model in tests); defaults to local Ollama.
+        `example_store` (services.example_store.ExampleStore) adds few-shot examples from the audit log.
+        `executor` is the thread pool the async methods use for SQLite work (default: asyncio's).
+        """
         self.db_path = db_path
-        self.llm = ChatOllama(
+        self.llm = llm or ChatOllama(
             model="qwen2.5-coder:1.5b",
             temperature=0,  
             base_url="http://localhost:11434"
         )
+        self.example_store = example_store
+        self.max_repairs = max_repairs
+        self.executor = executor
+        self.metrics = {"questions": 0, "first_attempt_success": 0, "answered": 0, "answered_llm_calls": 0}
+
+    async def _run(self, func, *args):
+        """Runs blocking SQLite work on the engine's executor."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def get_examples(self, user_query):
+        """Few-shot block for the generation prompt (empty without an example store)."""
+        if self.example_store is None:
+            return ""
+        return self.example_store.format_examples(os.path.basename(self.db_path), user_query)
+
+    def begin_question(self):
+        """Starts counting LLM calls for a new user question (call once per question)."""
+        _question_llm_calls.set([0])
+
+    def _count_llm_call(self):
+        calls = _question_llm_calls.get()
+        if calls is not None:
+            calls[0] += 1
+
+    def metrics_summary(self):
+        """First-attempt success rate and mean LLM calls per answered question."""
+        m = self.metrics
+        return {
+            **m,
+            "first_attempt_success_rate": m["first_attempt_success"] / m["questions"] if m["questions"] else 0.0,
+            "mean_llm_calls_per_answer": m["answered_llm_calls"] / m["answered"] if m["answered"] else 0.0,
+        }
 
     def get_database_schema(self):
         """Extracts schema. If file doesn't exist yet, returns empty for new DB scenarios."""
@@ -37,55 +139,129 @@ class NLPEngine:
         Triggers if subjective terms are used without a column.
         """
         schema = self.get_database_schema()
-        
-        clarification_template = """<|im_start|>system
-You are a SQL Architect. Analyze the user query against the SCHEMA.
-1. If 'high', 'best', 'top', or 'values' is used and multiple numeric columns exist, respond AMBIGUOUS.
-2. If the query clearly maps to a column or is a CREATE/INSERT action, respond CLEAR.
-3. If 'values' is used without a column name, it is ALWAYS AMBIGUOUS.
-
-SCHEMA:
-{schema}
-<|im_end|>
-<|im_start|>user
-{question}
-<|im_end|>
-<|im_start|>assistant
-"""
-        prompt = ChatPromptTemplate.from_template(clarification_template)
-        chain = prompt | self.llm
+        chain = ChatPromptTemplate.from_template(CLARIFICATION_TEMPLATE) | self.llm
+        self._count_llm_call()
         return chain.invoke({"schema": schema, "question": user_query}).content.strip()
 
+    async def aget_clarification(self, user_query):
+        """Non-blocking variant of get_clarification for the async API."""
+        schema = await self._run(self.get_database_schema)
+        chain = ChatPromptTemplate.from_template(CLARIFICATION_TEMPLATE) | self.llm
+        self._count_llm_call()
+        response = await chain.ainvoke({"schema": schema, "question": user_query})
+        return response.content.strip()
+
     def generate_sql(self, user_query):
         """
         Generalized SQL Generator with Intent Logic and Syntax Guards.
         """
         schema = self.get_database_schema()
+        examples = self.get_examples(user_query)
+        chain = ChatPromptTemplate.from_template(SQL_TEMPLATE) | self.llm
+        
+        try:
+            self._count_llm_call()
+            response = chain.invoke({"schema": schema, "examples": examples, "question": user_query})
+            return clean_sql(response.content)
+        except Exception as e:
+            return f"NLP Error: {str(e)}"
 
-        system_template = """<|im_start|>system
-You are an expert SQLite Translator. Logic rules:
-1. INTENT: "Show/List/Who" -> SELECT. "Total/Sum" -> SUM(). "How many" -> COUNT().
-2. SORTING: If "top/best/high", use ORDER BY [col] DESC LIMIT [N].
-3. SQLITE RULES: NEVER use 'CREATE DATABASE' or 'USE'. Use 'CREATE TABLE IF NOT EXISTS'.
-4. Output ONLY the SQL code. No markdown. No explanation.
+    async def agenerate_sql(self, user_query):
+        """Non-blocking variant of generate_sql for the async API."""
+        schema = await self._run(self.get_database_schema)
+        examples = await self._run(self.get_examples, user_query)
+        chain = ChatPromptTemplate.from_template(SQL_TEMPLATE) | self.llm
+
+        try:
+            self._count_llm_call()
+            response = await chain.ainvoke({"schema": schema, "examples": examples, "question": user_query})
+            return clean_sql(response.content)
+        except Exception as e:
+            return f"NLP Error: {str(e)}"
+
+    def repair_sql(self, user_query, failed_sql, error):
+        """Asks the LLM to fix SQL that SQLite rejected, given the error message."""
+        schema = self.get_database_schema()
+        chain = ChatPromptTemplate.from_template(REPAIR_TEMPLATE) | self.llm
+
+        try:
+            self._count_llm_call()
+            response = chain.invoke({"schema": schema, "question": user_query, "sql": failed_sql, "error": error})
+            return clean_sql(response.content)
+        except Exception as e:
+            return f"NLP Error: {str(e)}"
+
+    async def arepair_sql(self, user_query, failed_sql, error):
+        """Non-blocking variant of repair_sql for the async API."""
+        schema = await self._run(self.get_database_schema)
+        chain = ChatPromptTemplate.from_template(REPAIR_TEMPLATE) | self.llm
 
-SCHEMA:
-{schema}
-<|im_end|>
-<|im_start|>user
-{question}
-<|im_end|>
-<|im_start|>assistant
-"""
-        prompt = ChatPromptTemplate.from_template(system_template)
-        chain = prompt | self.llm
-        
         try:
-            response = chain.invoke({"schema": schema, "question": user_query})
-            return re.sub(r'```sql|```', '', response.content.strip()).strip()
+            self._count_llm_call()
+            response = await chain.ainvoke({"schema": schema, "question": user_query, "sql": failed_sql, "error": error})
+            return clean_sql(response.content)
         except Exception as e:
             return f"NLP Error: {str(e)}"
 
+    def record_outcome(self, first_result, final_result):
+        """
+        Updates first-attempt / answered counters for one executed question.
+        The LLM calls counted since begin_question() are only added when it was answered.
+        """
+        calls = _question_llm_calls.get()
+        _question_llm_calls.set(None)
+        self.metrics["questions"] += 1
+        if not is_execution_error(first_result):
+            self.metrics["first_attempt_success"] += 1
+        if not is_execution_error(final_result):
+            self.metrics["answered"] += 1
+            self.metrics["answered_llm_calls"] += calls[0] if calls else 0
+
+    def execute_with_repair(self, sql_query, user_query, guard=None, user_command=None):
+        """
+        Executes SQL and, on an SQLite error, feeds the error back to the LLM
+        for at most `max_repairs` corrected attempts. `guard(sql)` must approve
+        every repaired statement (RBAC / safety) before it runs.
+        `user_command` goes to the first execute_query (new-database handling).
+        Returns (final_sql, result).
+        """
+        result = first_result = self.execute_query(sql_query, user_command=user_command)
+        for _ in range(self.max_repairs):
+            if not is_execution_error(result):
+                break
+            repaired = self.repair_sql(user_query, sql_query, result)
+            if repaired.startswith("NLP Error") or repaired == sql_query or (guard and not guard(repaired)):
+                break
+            sql_query = repaired
+            result = self.execute_query(sql_query)
+        self.record_outcome(first_result, result)
+        return sql_query, result
+
+    async def aexecute_with_repair(self, sql_query, user_query, guard=None, execute=None, user_command=None):
+        """
+        Non-blocking variant of execute_with_repair; `guard` is an async callable here.
+        `execute(sql)` is an optional async runner (e.g. one that opens a streaming cursor);
+        it must return an "Execution Error: ..." string on failure.
+        `user_command` is only used by the default runner.
+        """
+        if execute is None:
+            first_attempt = self._run(self.execute_query, sql_query, user_command)
+            execute = lambda sql: self._run(self.execute_query, sql)
+        else:
+            first_attempt = execute(sql_query)
+
+        result = first_result = await first_attempt
+        for _ in range(self.max_repairs):
+            if not is_execution_error(result):
+                break
+            repaired = await self.arepair_sql(user_query, sql_query, result)
+            if repaired.startswith("NLP Error") or repaired == sql_query or (guard and not await guard(repaired)):
+                break
+            sql_query = repaired
+            result = await execute(sql_query)
+        self.record_outcome(first_result, result)
+        return sql_query, result
+
     def execute_query(self, sql_query, user_command=None):
         """Python-side file handling and SQL execution safety."""
         try:
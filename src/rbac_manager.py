@@ -72,3 +72,15 @@ def is_authorized(emp_id, sql_query):
             return False
 
     return True
+
+
+def get_user_role(emp_id):
+    """
+    Fetch role for given employee ID (empty string if unknown).
+    """
+    user = collection.find_one({"emp_id": emp_id})
+
+    if user:
+        return user.get("role", "")
+
+    return ""
@@ -0,0 +1,182 @@
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+from database.db_config import DB_PATH
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+class DatasetIndex:
+    """
+    Sparse, append-only TF-IDF index for one dataset.
+    Term counts are kept as flat (doc, term, count) arrays plus an inverted
+    index from term to entry positions; idf and document norms are derived
+    from them and recomputed only when new examples are appended.
+    """
+
+    def __init__(self):
+        self.last_id = 0
+        self.examples = []      # [(question, sql)]
+        self.positions = {}     # normalized question -> example position
+        self.vocab = {}         # term -> term id
+        self.postings = {}      # term id -> [entry position]
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.term_ids = np.zeros(0, dtype=np.int32)
+        self.counts = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.lock = threading.Lock()
+
+    def add(self, examples):
+        """Appends (question, sql) pairs; a repeated question keeps the newest SQL."""
+        docs, terms, counts = [], [], []
+        offset = len(self.doc_ids)
+        for question, sql in examples:
+            key = question.strip().lower()
+            if not key:
+                continue
+            if key in self.positions:
+                self.examples[self.positions[key]] = (question.strip(), sql.strip())
+                continue
+
+            doc = len(self.examples)
+            self.positions[key] = doc
+            self.examples.append((question.strip(), sql.strip()))
+            tf = {}
+            for t in tokenize(question):
+                term = self.vocab.setdefault(t, len(self.vocab))
+                tf[term] = tf.get(term, 0) + 1
+            for term, count in tf.items():
+                self.postings.setdefault(term, []).append(offset + len(docs))
+                docs.append(doc)
+                terms.append(term)
+                counts.append(count)
+
+        if docs:
+            self.doc_ids = np.concatenate([self.doc_ids, np.array(docs, dtype=np.int32)])
+            self.term_ids = np.concatenate([self.term_ids, np.array(terms, dtype=np.int32)])
+            self.counts = np.concatenate([self.counts, np.array(counts, dtype=np.float32)])
+            self._reweight()
+
+    def _reweight(self):
+        n_docs = len(self.examples)
+        df = np.bincount(self.term_ids, minlength=len(self.vocab))
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+        weights = self.counts * self.idf[self.term_ids]
+        self.norms = np.sqrt(np.bincount(self.doc_ids, weights=weights ** 2, minlength=n_docs)).astype(np.float32)
+
+    def search(self, question, k, min_score):
+        if not self.examples:
+            return []
+
+        known, unseen = {}, {}
+        for t in tokenize(question):
+            if t in self.vocab:
+                known[self.vocab[t]] = known.get(self.vocab[t], 0) + 1
+            else:
+                unseen[t] = unseen.get(t, 0) + 1
+        if not known:
+            return []
+
+        # Words no example uses still count towards the query length (with the highest idf)
+        query_terms = np.fromiter(known.keys(), dtype=np.int32)
+        query_weights = np.fromiter(known.values(), dtype=np.float32) * self.idf[query_terms]
+        unseen_idf = np.log(1 + len(self.examples)) + 1
+        query_norm = np.sqrt(np.dot(query_weights, query_weights)
+                             + sum((count * unseen_idf) ** 2 for count in unseen.values()))
+
+        # Only documents sharing a term with the query are scored
+        entries = np.concatenate([np.asarray(self.postings[t], dtype=np.int64) for t in known])
+        entry_terms = self.term_ids[entries]
+        order = np.argsort(query_terms)
+        entry_query_weights = query_weights[order][np.searchsorted(query_terms[order], entry_terms)]
+        contrib = self.counts[entries] * self.idf[entry_terms] * entry_query_weights
+        candidates, inverse = np.unique(self.doc_ids[entries], return_inverse=True)
+        scores = np.bincount(inverse, weights=contrib) / (self.norms[candidates] * query_norm)
+
+        top = np.argsort(-scores)[:k]
+        return [self.examples[candidates[i]] for i in top if scores[i] >= min_score]
+
+
+class ExampleStore:
+    """
+    Few-shot example store mined from successful audit_log entries.
+    One sparse TF-IDF index per dataset, extended with audit rows newer than the last one seen.
+    Older rows were logged as SUCCESS even when execution failed, so every
+    candidate is checked once with EXPLAIN against data_dir/<dataset> before it is indexed.
+    """
+
+    def __init__(self, audit_db_path=DB_PATH, data_dir="data", min_score=0.2):
+        self.audit_db_path = audit_db_path
+        self.data_dir = data_dir
+        self.min_score = min_score
+        self._indexes = {}  # dataset_name -> DatasetIndex
+        self._lock = threading.Lock()  # only guards creation of per-dataset indexes
+
+    def _new_rows(self, dataset_name, last_id):
+        with sqlite3.connect(self.audit_db_path) as conn:
+            return conn.execute("""
+                SELECT id, natural_language_query, generated_sql FROM audit_log
+                WHERE dataset_name = ? AND id > ? AND outcome_status = 'SUCCESS' AND action_type = 'SELECT'
+                  AND natural_language_query IS NOT NULL AND generated_sql IS NOT NULL
+                ORDER BY id
+            """, (dataset_name, last_id)).fetchall()
+
+    def _valid_examples(self, dataset_name, examples):
+        """Keeps only read-only SQL that still compiles against the dataset file."""
+        db_path = os.path.join(self.data_dir, dataset_name)
+        valid = []
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            for question, sql in examples:
+                statement = sql.rstrip().rstrip(";")
+                if not statement.lower().startswith("select"):
+                    continue
+                try:
+                    conn.execute("EXPLAIN " + statement)
+                except (sqlite3.Error, sqlite3.Warning):
+                    continue
+                valid.append((question, sql))
+        finally:
+            conn.close()
+        return valid
+
+    def _get_index(self, dataset_name):
+        with self._lock:
+            return self._indexes.setdefault(dataset_name, DatasetIndex())
+
+    def _refresh(self, dataset_name, index):
+        """Indexes audit rows written since the last refresh (caller holds index.lock)."""
+        if os.path.basename(dataset_name) != dataset_name or not os.path.isfile(os.path.join(self.data_dir, dataset_name)):
+            return
+        try:
+            rows = self._new_rows(dataset_name, index.last_id)
+        except sqlite3.Error:
+            return
+        if rows:
+            index.add(self._valid_examples(dataset_name, [(q, sql) for _, q, sql in rows]))
+            index.last_id = rows[-1][0]
+
+    def search(self, dataset_name, question, k=3):
+        """Returns up to k (question, sql) pairs most similar to `question`."""
+        index = self._get_index(dataset_name)
+        with index.lock:
+            self._refresh(dataset_name, index)
+            return index.search(question, k, self.min_score)
+
+    def format_examples(self, dataset_name, question, k=3):
+        """Renders the top matches as a prompt block (empty string if none)."""
+        matches = self.search(dataset_name, question, k)
+        if not matches:
+            return ""
+        lines = ["EXAMPLES (previously successful queries on this database):"]
+        for q, sql in matches:
+            lines.append(f"Q: {q}\nSQL: {sql}")
+        return "\n\n".join(lines)
@@ -0,0 +1,35 @@
+import os
+import sys
+import sqlite3
+
+import pytest
+
+# The app modules import each other as top-level modules from src/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from database import audit_schema
+from services import audit_logger
+
+
+@pytest.fixture
+def audit_db(tmp_path, monkeypatch):
+    """Points audit logging at a fresh audit_log table instead of src/database/audit.db."""
+    path = str(tmp_path / "audit.db")
+    monkeypatch.setattr(audit_schema, "DB_PATH", path)
+    monkeypatch.setattr(audit_logger, "DB_PATH", path)
+    audit_schema.create_audit_table()
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """A data/ folder holding one small dataset, shop.sqlite."""
+    folder = tmp_path / "data"
+    folder.mkdir()
+    conn = sqlite3.connect(folder / "shop.sqlite")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, price REAL)")
+    conn.executemany("INSERT INTO items (name, price) VALUES (?, ?)",
+                     [("pen", 1.5), ("book", 12.0), ("lamp", 30.0)])
+    conn.commit()
+    conn.close()
+    return str(folder)
@@ -0,0 +1,137 @@
+import json
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import api_server
+from services.example_store import ExampleStore
+
+
+@pytest.fixture
+def make_client(data_dir, audit_db, monkeypatch):
+    """Builds a TestClient whose LLM replies with `responses` in order."""
+    monkeypatch.setattr(api_server, "DATA_DIR", data_dir)
+    monkeypatch.setattr(api_server, "get_user_role", lambda emp_id: "Admin")
+    monkeypatch.setattr(api_server, "is_authorized", lambda emp_id, sql: True)
+
+    def make(responses):
+        app = api_server.create_app(
+            llm=FakeListChatModel(responses=responses),
+            example_store=ExampleStore(audit_db_path=audit_db, data_dir=data_dir),
+        )
+        return TestClient(app)
+    return make
+
+
+def query(client, question="list items", **extra):
+    return client.post("/query", json={"emp_id": "E001", "dataset": "shop.sqlite", "question": question, **extra})
+
+
+def audit_rows(audit_db):
+    with sqlite3.connect(audit_db) as conn:
+        return conn.execute("SELECT action_type, outcome_status, affected_rows FROM audit_log ORDER BY id").fetchall()
+
+
+def test_query_returns_rows(make_client, audit_db):
+    with make_client(["CLEAR", "SELECT name FROM items ORDER BY id"]) as client:
+        res = query(client)
+
+    assert res.status_code == 200
+    body = res.json()
+    assert body["rows"] == [{"name": "pen"}, {"name": "book"}, {"name": "lamp"}]
+    assert body["row_count"] == 3
+    assert audit_rows(audit_db) == [("SELECT", "SUCCESS", 3)]
+
+
+def test_query_streams_ndjson(make_client, audit_db):
+    with make_client(["CLEAR", "SELECT name FROM items ORDER BY id;"]) as client:
+        res = query(client, stream="ndjson")
+
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert lines[0] == {"type": "columns", "sql": "SELECT name FROM items ORDER BY id;", "columns": ["name"]}
+    assert [l["data"]["name"] for l in lines[1:-1]] == ["pen", "book", "lamp"]
+    assert lines[-1] == {"type": "end", "row_count": 3}
+    assert audit_rows(audit_db) == [("SELECT", "SUCCESS", 3)]
+
+
+def test_query_streams_json(make_client):
+    with make_client(["CLEAR", "SELECT name, price FROM items WHERE price > 10 ORDER BY id"]) as client:
+        res = query(client, stream="json")
+
+    body = json.loads(res.text)
+    assert body["columns"] == ["name", "price"]
+    assert body["rows"] == [{"name": "book", "price": 12.0}, {"name": "lamp", "price": 30.0}]
+    assert body["row_count"] == 2
+
+
+def test_ambiguous_question_is_not_executed(make_client, audit_db):
+    with make_client(["AMBIGUOUS: which column?"]) as client:
+        body = query(client, "show high values").json()
+
+    assert body["status"] == "ambiguous"
+    assert audit_rows(audit_db) == []
+
+
+def test_dml_token_approve(make_client, data_dir, audit_db):
+    with make_client(["CLEAR", "DELETE FROM items WHERE name = 'pen'"]) as client:
+        pending = query(client, "delete the pen").json()
+        assert pending["status"] == "confirmation_required"
+
+        res = client.post("/execute", json={"emp_id": "E001", "token": pending["token"]})
+        assert res.json()["status"] == "committed"
+
+        # Tokens are single use
+        again = client.post("/execute", json={"emp_id": "E001", "token": pending["token"]})
+        assert again.status_code == 404
+
+    with sqlite3.connect(f"{data_dir}/shop.sqlite") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2
+    assert audit_rows(audit_db) == [("DML_COMMIT", "SUCCESS", 0)]
+
+
+def test_dml_token_reject(make_client, data_dir):
+    with make_client(["CLEAR", "DELETE FROM items WHERE name = 'pen'"]) as client:
+        token = query(client, "delete the pen").json()["token"]
+        res = client.post("/execute", json={"emp_id": "E001", "token": token, "approve": False})
+
+    assert res.json()["status"] == "rejected"
+    with sqlite3.connect(f"{data_dir}/shop.sqlite") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 3
+
+
+def test_dml_token_wrong_emp_id(make_client):
+    with make_client(["CLEAR", "DELETE FROM items WHERE name = 'pen'"]) as client:
+        token = query(client, "delete the pen").json()["token"]
+        res = client.post("/execute", json={"emp_id": "E003", "token": token})
+
+    assert res.status_code == 404
+
+
+def test_dml_token_expires(make_client, monkeypatch):
+    monkeypatch.setattr(api_server, "PENDING_TTL_SECONDS", -1)
+    with make_client(["CLEAR", "DELETE FROM items WHERE name = 'pen'"]) as client:
+        token = query(client, "delete the pen").json()["token"]
+        res = client.post("/execute", json={"emp_id": "E001", "token": token})
+
+    assert res.status_code == 404
+
+
+def test_rbac_denial_returns_403(make_client, monkeypatch, audit_db):
+    monkeypatch.setattr(api_server, "is_authorized", lambda emp_id, sql: False)
+    with make_client(["CLEAR", "SELECT name FROM items"]) as client:
+        res = query(client)
+
+    assert res.status_code == 403
+    assert audit_rows(audit_db) == []
+
+
+def test_dataset_traversal_returns_404(make_client):
+    with make_client(["CLEAR"]) as client:
+        res = client.post("/query", json={"emp_id": "E001", "dataset": "../shop.sqlite", "question": "x"})
+        missing = client.post("/clarify", json={"dataset": "../../etc/passwd", "question": "x"})
+
+    assert res.status_code == 404
+    assert missing.status_code == 404
@@ -0,0 +1,81 @@
+import sqlite3
+
+from services.audit_logger import log_action
+from services.example_store import ExampleStore
+
+
+def log_select(question, sql, dataset="shop.sqlite", outcome="SUCCESS"):
+    log_action("E001", "Admin", "SELECT", dataset, question, sql, outcome, 1)
+
+
+def test_search_ranks_closest_question_first(audit_db, data_dir):
+    log_select("list all item names", "SELECT name FROM items")
+    log_select("most expensive item price", "SELECT MAX(price) FROM items")
+    log_select("how many items are there", "SELECT COUNT(*) FROM items")
+    store = ExampleStore(audit_db_path=audit_db, data_dir=data_dir)
+
+    results = store.search("shop.sqlite", "what is the most expensive price", k=2)
+
+    assert results[0] == ("most expensive item price", "SELECT MAX(price) FROM items")
+
+
+def test_min_score_cuts_off_unrelated_questions(audit_db, data_dir):
+    log_select("list all item names", "SELECT name FROM items")
+    store = ExampleStore(audit_db_path=audit_db, data_dir=data_dir, min_score=0.5)
+
+    assert store.search("shop.sqlite", "names of stores cities regions managers") == []
+    assert store.search("shop.sqlite", "completely unrelated words") == []
+    assert store.format_examples("shop.sqlite", "completely unrelated words") == ""
+
+
+def test_index_rebuilds_when_audit_log_grows(audit_db, data_dir):
+    log_select("list all item names", "SELECT name FROM items")
+    store = ExampleStore(audit_db_path=audit_db, data_dir=data_dir)
+    assert store.search("shop.sqlite", "cheapest product") == []
+
+    log_select("cheapest product", "SELECT name FROM items ORDER BY price LIMIT 1")
+
+    assert store.search("shop.sqlite", "cheapest product") == [("cheapest product", "SELECT name FROM items ORDER BY price LIMIT 1")]
+
+
+def test_failed_broken_and_foreign_rows_are_skipped(audit_db, data_dir):
+    log_select("item names", "SELECT name FROM items", outcome="ERROR")
+    log_select("item titles", "SELECT title FROM items")  # logged SUCCESS, but the column does not exist
+    log_select("item names please", "SELECT name FROM items", dataset="data/shop.sqlite")
+    log_select("item names too", "SELECT name FROM items; DROP TABLE items")
+    store = ExampleStore(audit_db_path=audit_db, data_dir=data_dir)
+
+    assert store.search("shop.sqlite", "item names titles") == []
+    assert store.search("data/shop.sqlite", "item names please") == []
+
+
+def test_newest_valid_sql_wins_for_repeated_question(audit_db, data_dir):
+    log_select("item names", "SELECT name FROM items")
+    log_select("item names", "SELECT nme FROM items")
+    store = ExampleStore(audit_db_path=audit_db, data_dir=data_dir)
+
+    assert store.search("shop.sqlite", "item names") == [("item names", "SELECT name FROM items")]
+
+
+def test_empty_and_missing_audit_table(audit_db, data_dir, tmp_path):
+    assert ExampleStore(audit_db_path=audit_db, data_dir=data_dir).search("shop.sqlite", "item names") == []
+
+    bare = str(tmp_path / "bare.db")
+    sqlite3.connect(bare).close()
+    assert ExampleStore(audit_db_path=bare, data_dir=data_dir).search("shop.sqlite", "item names") == []
+
+
+def test_refresh_only_checks_new_rows(audit_db, data_dir, monkeypatch):
+    log_select("list all item names", "SELECT name FROM items")
+    store = ExampleStore(audit_db_path=audit_db, data_dir=data_dir)
+    checked = []
+    original = store._valid_examples
+    monkeypatch.setattr(store, "_valid_examples", lambda name, rows: checked.extend(rows) or original(name, rows))
+
+    store.search("shop.sqlite", "item names")
+    store.search("shop.sqlite", "item names")
+    log_select("cheapest product", "SELECT name FROM items ORDER BY price LIMIT 1")
+    results = store.search("shop.sqlite", "cheapest product")
+
+    assert [q for q, _ in checked] == ["list all item names", "cheapest product"]
+    assert results == [("cheapest product", "SELECT name FROM items ORDER BY price LIMIT 1")]
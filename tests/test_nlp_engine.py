@@ -0,0 +1,129 @@
+import asyncio
+import os
+
+import pandas as pd
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from nlp_engine import NLPEngine, is_execution_error
+
+
+def make_engine(data_dir, responses, **kwargs):
+    # The trailing reply keeps llm.i (replies consumed) from wrapping back to 0
+    llm = FakeListChatModel(responses=responses + ["UNUSED"])
+    return NLPEngine(os.path.join(data_dir, "shop.sqlite"), llm=llm, **kwargs), llm
+
+
+def test_repair_fixes_failing_sql(data_dir):
+    engine, llm = make_engine(data_dir, ["SELECT name FROM items"])
+    engine.begin_question()
+
+    sql, result = engine.execute_with_repair("SELECT nme FROM items", "item names")
+
+    assert sql == "SELECT name FROM items"
+    assert isinstance(result, pd.DataFrame) and len(result) == 3
+    assert llm.i == 1
+    summary = engine.metrics_summary()
+    assert summary["first_attempt_success_rate"] == 0.0
+    assert summary["answered"] == 1
+    assert summary["mean_llm_calls_per_answer"] == 1.0
+
+
+def test_guard_rejection_keeps_original_failure(data_dir):
+    engine, _ = make_engine(data_dir, ["DELETE FROM items WHERE id = 1"])
+
+    sql, result = engine.execute_with_repair("SELECT nme FROM items", "item names", guard=lambda s: False)
+
+    assert sql == "SELECT nme FROM items"
+    assert is_execution_error(result)
+    assert engine.metrics["answered"] == 0
+
+
+def test_same_sql_from_model_stops_repairing(data_dir):
+    engine, llm = make_engine(data_dir, ["SELECT nme FROM items"], max_repairs=3)
+
+    sql, result = engine.execute_with_repair("SELECT nme FROM items", "item names")
+
+    assert is_execution_error(result)
+    assert llm.i == 1
+
+
+def test_max_repairs_is_honoured(data_dir):
+    engine, llm = make_engine(data_dir, ["SELECT a FROM items", "SELECT b FROM items", "SELECT c FROM items"], max_repairs=2)
+    sql, result = engine.execute_with_repair("SELECT nme FROM items", "item names")
+    assert sql == "SELECT b FROM items"
+    assert is_execution_error(result)
+    assert llm.i == 2
+
+    engine, llm = make_engine(data_dir, ["SELECT name FROM items"], max_repairs=0)
+    sql, result = engine.execute_with_repair("SELECT nme FROM items", "item names")
+    assert is_execution_error(result)
+    assert llm.i == 0
+
+
+def test_async_repair_uses_custom_runner(data_dir):
+    engine, _ = make_engine(data_dir, ["SELECT name FROM items"])
+    seen = []
+
+    async def execute(sql):
+        seen.append(sql)
+        return "Execution Error: boom" if len(seen) == 1 else "ok"
+
+    async def guard(sql):
+        return True
+
+    sql, result = asyncio.run(engine.aexecute_with_repair("SELECT nme FROM items", "item names", guard=guard, execute=execute))
+
+    assert seen == ["SELECT nme FROM items", "SELECT name FROM items"]
+    assert (sql, result) == ("SELECT name FROM items", "ok")
+
+
+def test_user_command_still_switches_database(data_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine, _ = make_engine(data_dir, ["unused"])
+
+    _, result = engine.execute_with_repair("CREATE TABLE notes (id INTEGER)", "make notes",
+                                           user_command="create database fresh")
+
+    assert engine.db_path == "data/fresh.sqlite"
+    assert result.startswith("✅ Success")
+    assert os.path.exists(tmp_path / "data" / "fresh.sqlite")
+
+
+def test_llm_calls_only_count_for_answered_questions(data_dir):
+    engine, _ = make_engine(data_dir, ["AMBIGUOUS", "CLEAR", "SELECT name FROM items"])
+
+    # Ambiguous question: one call, never executed
+    engine.begin_question()
+    engine.get_clarification("show high values")
+
+    engine.begin_question()
+    engine.get_clarification("item names")
+    sql = engine.generate_sql("item names")
+    engine.execute_with_repair(sql, "item names")
+
+    summary = engine.metrics_summary()
+    assert summary["questions"] == 1
+    assert summary["first_attempt_success_rate"] == 1.0
+    assert summary["mean_llm_calls_per_answer"] == 2.0
+
+
+def test_generation_prompt_includes_examples(data_dir):
+    class Store:
+        def format_examples(self, dataset_name, question):
+            return f"EXAMPLES for {dataset_name}: {question}"
+
+    prompts = []
+
+    def record(prompt):
+        prompts.append(prompt.to_string())
+        return AIMessage(content="SELECT 1")
+
+    engine = NLPEngine(os.path.join(data_dir, "shop.sqlite"), llm=RunnableLambda(record), example_store=Store())
+
+    assert engine.generate_sql("item names") == "SELECT 1"
+    assert asyncio.run(engine.agenerate_sql("item prices")) == "SELECT 1"
+    assert "EXAMPLES for shop.sqlite: item names" in prompts[0]
+    assert "EXAMPLES for shop.sqlite: item prices" in prompts[1]
+    assert "CREATE TABLE items" in prompts[0]